@@ -1,4 +1,6 @@
+import redis
 from flask import Flask
+from flask_session import Session
 from config import Config
 from models import Base
 from sql_db import engine
@@ -10,8 +12,17 @@ def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
 
-    # create tables for demo
-    Base.metadata.create_all(bind=engine)
+    # keep cart/checkout server-side; the cookie only carries the session id
+    if Config.REDIS_URL:
+        app.config.update(
+            SESSION_TYPE="redis",
+            SESSION_REDIS=redis.Redis.from_url(Config.REDIS_URL),
+        )
+        Session(app)
+
+    # create tables for the local SQLite demo; Cloud SQL uses `alembic upgrade head`
+    if Config.LOCAL_DB:
+        Base.metadata.create_all(bind=engine)
 
     app.register_blueprint(web)
     app.register_blueprint(api)
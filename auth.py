@@ -1,13 +1,76 @@
+import os
 from functools import wraps
+
+import bcrypt
 from flask import session, redirect, url_for, flash
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
+
+try:
+    from argon2 import PasswordHasher
+    from argon2.exceptions import InvalidHashError, VerificationError
+except ImportError:  # optional: only needed when PASSWORD_HASHER=argon2 or for argon2 hashes
+    PasswordHasher = None
+
+# "bcrypt" (default) or "argon2"; new hashes use this, old ones still verify
+PASSWORD_HASHER = os.getenv("PASSWORD_HASHER", "bcrypt").lower()
+
+# bcrypt cost factor (2^rounds); tune so a single hash takes ~250ms
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# argon2id parameters; tune so a single hash takes ~250ms
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", str(64 * 1024)))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "2"))
+
+_BCRYPT_PREFIXES = ("$2b$", "$2a$", "$2y$")
+
+if PASSWORD_HASHER not in ("bcrypt", "argon2"):
+    raise RuntimeError(f"Unknown PASSWORD_HASHER: {PASSWORD_HASHER!r}")
+if PASSWORD_HASHER == "argon2" and PasswordHasher is None:
+    raise RuntimeError("PASSWORD_HASHER=argon2 requires the argon2-cffi package")
+
+_PH = PasswordHasher(
+    time_cost=ARGON2_TIME_COST,
+    memory_cost=ARGON2_MEMORY_COST,
+    parallelism=ARGON2_PARALLELISM,
+) if PasswordHasher is not None else None
 
 def hash_password(pw: str) -> str:
-    return generate_password_hash(pw)
+    if PASSWORD_HASHER == "argon2":
+        return _PH.hash(pw)
+    return bcrypt.hashpw(pw.encode(), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
 
 def verify_password(pw: str, pw_hash: str) -> bool:
+    if pw_hash.startswith("$argon2"):
+        if _PH is None:
+            return False
+        try:
+            return _PH.verify(pw_hash, pw)
+        except (VerificationError, InvalidHashError):
+            return False
+    if pw_hash.startswith(_BCRYPT_PREFIXES):
+        return bcrypt.checkpw(pw.encode(), pw_hash.encode())
+    # legacy werkzeug hashes (pbkdf2:/scrypt:) created before the bcrypt switch
     return check_password_hash(pw_hash, pw)
 
+def needs_rehash(pw_hash: str) -> bool:
+    """
+    True when a (verified) hash was made with another scheme or older cost
+    settings, so login should store a fresh hash_password() result.
+    """
+    if PASSWORD_HASHER == "argon2":
+        if not pw_hash.startswith("$argon2"):
+            return True
+        try:
+            return _PH.check_needs_rehash(pw_hash)
+        except InvalidHashError:
+            return True
+
+    if not pw_hash.startswith(_BCRYPT_PREFIXES):
+        return True
+    # "$2b$12$..." -> 12
+    return int(pw_hash.split("$")[2]) != BCRYPT_ROUNDS
+
 def login_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
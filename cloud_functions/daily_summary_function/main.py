@@ -1,8 +1,95 @@
-import json
+import os
+import orjson
+import random
+import time
 from datetime import datetime
 from google.cloud import firestore
+from google.api_core.exceptions import Aborted, ServiceUnavailable
+
+# Same Firestore Native database as the web app (firestore_db.FIRESTORE_DB_ID)
+FIRESTORE_DB_ID = os.getenv("FIRESTORE_DB_ID", "default")
+
+db = firestore.Client(database=FIRESTORE_DB_ID)
+
+
+def _warm_up():
+    """
+    One tiny read at import so the gRPC channel and auth token are ready
+    before the first request. Never fails or stalls startup.
+    """
+    try:
+        # no retries and a short deadline: warm-up must never stall the cold start
+        next(db.collection("_warmup").limit(1).stream(retry=None, timeout=2), None)
+    except Exception as e:
+        print(f"[Firestore] warm-up skipped: {e}")
+
+
+_warm_up()
+
+# Firestore caps a batch at 500 writes; stay under it
+BATCH_SIZE = 450
+MAX_RETRIES = 3
+RETRY_SLEEP_SECONDS = 1.0
+MAX_BACKOFF_MULTIPLIER = 30
+
+
+def _read_json(request):
+    """
+    Parses the request body with orjson; bad or missing JSON gives {}.
+    """
+    raw = request.get_data(cache=False)
+    if not raw:
+        return {}
+    try:
+        data = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _backoff_seconds(attempt):
+    """
+    Exponential backoff with jitter, same schedule as firestore_db._backoff_seconds.
+    """
+    return (
+        min(MAX_BACKOFF_MULTIPLIER, 2 ** (attempt - 1))
+        * RETRY_SLEEP_SECONDS
+        * random.uniform(0.5, 1.5)
+    )
+
+
+def _commit_with_retry(batch):
+    last_err = None
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            return batch.commit()
+        except (Aborted, ServiceUnavailable) as e:
+            last_err = e
+            print(f"[Firestore] batch commit failed (attempt {attempt}/{MAX_RETRIES}): {e}")
+            if attempt < MAX_RETRIES:
+                time.sleep(_backoff_seconds(attempt))
+    raise RuntimeError(f"Firestore batch commit failed after {MAX_RETRIES} attempts: {last_err}")
+
+
+def _summary_doc(data, created_at):
+    """
+    Builds a summary document, or returns None if required fields are missing.
+    """
+    date = data.get("date")
+    total_sales = data.get("total_sales")
+    order_count = data.get("order_count")
+
+    if not date or total_sales is None or order_count is None:
+        return None
+
+    return {
+        "date": date,
+        "total_sales": float(total_sales),
+        "order_count": int(order_count),
+        "created_at": created_at,
+        "source": "cloud_function_daily_summary"
+    }
 
-db = firestore.Client()
 
 def daily_sales_summary(request):
     """
@@ -15,30 +102,45 @@ def daily_sales_summary(request):
         "total_sales": 123.45,
         "order_count": 7
     }
+
+    For backfills, many days at once:
+    { "items": [ {date, total_sales, order_count}, ... ] }
     """
 
     try:
-        data = request.get_json(silent=True) or {}
+        data = _read_json(request)
+        created_at = datetime.utcnow().isoformat() + "Z"
 
-        date = data.get("date")
-        total_sales = data.get("total_sales")
-        order_count = data.get("order_count")
+        items = data.get("items")
+        if isinstance(items, list):
+            docs = []
+            for i, item in enumerate(items):
+                doc = _summary_doc(item, created_at) if isinstance(item, dict) else None
+                if doc is None:
+                    return (f"Missing date / total_sales / order_count in items[{i}]", 400)
+                docs.append(doc)
 
-        if not date or total_sales is None or order_count is None:
-            return ("Missing date / total_sales / order_count", 400)
+            col = db.collection("daily_summaries")
+            for start in range(0, len(docs), BATCH_SIZE):
+                batch = db.batch()
+                for doc in docs[start:start + BATCH_SIZE]:
+                    batch.set(col.document(doc["date"]), doc)
+                _commit_with_retry(batch)
 
-        doc = {
-            "date": date,
-            "total_sales": float(total_sales),
-            "order_count": int(order_count),
-            "created_at": datetime.utcnow().isoformat() + "Z",
-            "source": "cloud_function_daily_summary"
-        }
+            return (
+                orjson.dumps({"ok": True, "dates": [d["date"] for d in docs]}),
+                200,
+                {"Content-Type": "application/json"}
+            )
+
+        doc = _summary_doc(data, created_at)
+        if doc is None:
+            return ("Missing date / total_sales / order_count", 400)
 
-        db.collection("daily_summaries").document(date).set(doc)
+        db.collection("daily_summaries").document(doc["date"]).set(doc)
 
         return (
-            json.dumps({"ok": True, "date": date}),
+            orjson.dumps({"ok": True, "date": doc["date"]}),
             200,
             {"Content-Type": "application/json"}
         )
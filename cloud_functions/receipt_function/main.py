@@ -1,39 +1,155 @@
 import os
-import json
+import orjson
+import random
+import time
 from datetime import datetime
 from google.cloud import firestore
+from google.api_core.exceptions import Aborted, ServiceUnavailable
+
+# Same Firestore Native database as the web app (firestore_db.FIRESTORE_DB_ID)
+FIRESTORE_DB_ID = os.getenv("FIRESTORE_DB_ID", "default")
+
+db = firestore.Client(database=FIRESTORE_DB_ID)
+
+
+def _warm_up():
+    """
+    One tiny read at import so the gRPC channel and auth token are ready
+    before the first request. Never fails or stalls startup.
+    """
+    try:
+        # no retries and a short deadline: warm-up must never stall the cold start
+        next(db.collection("_warmup").limit(1).stream(retry=None, timeout=2), None)
+    except Exception as e:
+        print(f"[Firestore] warm-up skipped: {e}")
+
+
+_warm_up()
+
+# Firestore caps a batch at 500 writes; stay under it
+BATCH_SIZE = 450
+MAX_RETRIES = 3
+RETRY_SLEEP_SECONDS = 1.0
+MAX_BACKOFF_MULTIPLIER = 30
+
+
+def _read_json(request):
+    """
+    Parses the request body with orjson; bad or missing JSON gives {}.
+    """
+    raw = request.get_data(cache=False)
+    if not raw:
+        return {}
+    try:
+        data = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _backoff_seconds(attempt):
+    """
+    Exponential backoff with jitter, same schedule as firestore_db._backoff_seconds.
+    """
+    return (
+        min(MAX_BACKOFF_MULTIPLIER, 2 ** (attempt - 1))
+        * RETRY_SLEEP_SECONDS
+        * random.uniform(0.5, 1.5)
+    )
+
+
+def _commit_with_retry(batch):
+    last_err = None
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            return batch.commit()
+        except (Aborted, ServiceUnavailable) as e:
+            last_err = e
+            print(f"[Firestore] batch commit failed (attempt {attempt}/{MAX_RETRIES}): {e}")
+            if attempt < MAX_RETRIES:
+                time.sleep(_backoff_seconds(attempt))
+    raise RuntimeError(f"Firestore batch commit failed after {MAX_RETRIES} attempts: {last_err}")
+
+
+def _receipt_doc(data, created_at):
+    """
+    Builds a receipt document, or returns None if required fields are missing.
+    """
+    order_id = data.get("order_id")
+    email = data.get("email")
+    total = data.get("total")
+
+    if not order_id or not email or total is None:
+        return None
+
+    return {
+        "order_id": order_id,
+        "email": email,
+        "total": total,
+        "created_at": created_at,
+        "source": "cloud_function"
+    }
+
+
+def _create_receipts_bulk(items, created_at):
+    """
+    Writes many receipts with WriteBatch commits of up to BATCH_SIZE.
+    Receipts are keyed by order_id, so re-sending a backfill after a partial
+    failure overwrites the batches that already committed instead of duplicating them.
+    """
+    docs = []
+    for i, item in enumerate(items):
+        doc = _receipt_doc(item, created_at) if isinstance(item, dict) else None
+        if doc is None:
+            return None, f"Missing order_id/email/total in items[{i}]"
+        docs.append(doc)
+
+    receipt_ids = []
+    col = db.collection("receipts")
+    for start in range(0, len(docs), BATCH_SIZE):
+        batch = db.batch()
+        for doc in docs[start:start + BATCH_SIZE]:
+            ref = col.document(str(doc["order_id"]))
+            batch.set(ref, doc)
+            receipt_ids.append(ref.id)
+        _commit_with_retry(batch)
+
+    return receipt_ids, None
 
-db = firestore.Client()
 
 def create_receipt(request):
     """
     HTTP Cloud Function
     - Expects JSON: { "order_id": 123, "email": "x@y.com", "total": 12.34 }
-    - Writes a receipt document to Firestore
+      or for backfills: { "items": [ {order_id, email, total}, ... ] }
+    - Writes receipt document(s) to Firestore
     - Returns: { "ok": true, "receipt_id": "...", "created_at": "..." }
+      (bulk: { "ok": true, "receipt_ids": [...], "count": n, "created_at": "..." })
     """
     try:
-        data = request.get_json(silent=True) or {}
-        order_id = data.get("order_id")
-        email = data.get("email")
-        total = data.get("total")
+        data = _read_json(request)
+        created_at = datetime.utcnow().isoformat() + "Z"
 
-        if not order_id or not email or total is None:
-            return ("Missing order_id/email/total", 400)
+        items = data.get("items")
+        if isinstance(items, list):
+            receipt_ids, err = _create_receipts_bulk(items, created_at)
+            if err:
+                return (err, 400)
 
-        created_at = datetime.utcnow().isoformat() + "Z"
+            return (orjson.dumps({
+                "ok": True,
+                "receipt_ids": receipt_ids,
+                "count": len(receipt_ids),
+                "created_at": created_at
+            }), 200, {"Content-Type": "application/json"})
 
-        doc = {
-            "order_id": order_id,
-            "email": email,
-            "total": total,
-            "created_at": created_at,
-            "source": "cloud_function"
-        }
+        doc = _receipt_doc(data, created_at)
+        if doc is None:
+            return ("Missing order_id/email/total", 400)
 
         ref = db.collection("receipts").add(doc)[1]
 
-        return (json.dumps({
+        return (orjson.dumps({
             "ok": True,
             "receipt_id": ref.id,
             "created_at": created_at
@@ -3,6 +3,13 @@ import os
 class Config:
     SECRET_KEY = os.getenv("FLASK_SECRET_KEY", "dev-secret")
 
+    # How long the session's cart price snapshot is trusted before /cart re-reads the DB
+    CART_PRICES_TTL_SECONDS = int(os.getenv("CART_PRICES_TTL_SECONDS", "300"))
+
+    # Server-side sessions (Flask-Session) when set, e.g. redis://10.0.0.3:6379/0;
+    # unset falls back to Flask's signed-cookie sessions
+    REDIS_URL = os.getenv("REDIS_URL", "")
+
     # LOCAL mode uses SQLite
     LOCAL_DB = os.getenv("LOCAL_DB", "1") == "1"
 
@@ -17,3 +24,10 @@ class Config:
             f"postgresql+psycopg2://{DB_USER}:{DB_PASS}@/"
             f"{DB_NAME}?host=/cloudsql/{CLOUD_SQL_CONNECTION_NAME}"
         )
+
+    # Connection pool (Cloud SQL). Keep DB_POOL_SIZE + DB_MAX_OVERFLOW, times the
+    # number of instances/workers, below the database's max_connections.
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "5"))
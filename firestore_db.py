@@ -1,7 +1,8 @@
 import os
+import random
 import time
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, List, Optional
 
 from google.cloud import firestore
 from google.api_core.exceptions import GoogleAPICallError, RetryError, ServiceUnavailable
@@ -12,6 +13,9 @@ from google.api_core.exceptions import GoogleAPICallError, RetryError, ServiceUn
 COLLECTION_NAME = "order_events"
 MAX_RETRIES = 3
 RETRY_SLEEP_SECONDS = 1.0
+MAX_BACKOFF_MULTIPLIER = 30
+# Firestore caps a batch at 500 writes; stay under it
+BATCH_SIZE = 450
 
 # IMPORTANT:
 # Use Firestore Native database id: "default"
@@ -39,21 +43,24 @@ def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
-def log_order_event(
+def _backoff_seconds(attempt: int) -> float:
+    """
+    Exponential backoff with jitter: ~1s, 2s, 4s ... (capped), +/-50%.
+    """
+    return (
+        min(MAX_BACKOFF_MULTIPLIER, 2 ** (attempt - 1))
+        * RETRY_SLEEP_SECONDS
+        * random.uniform(0.5, 1.5)
+    )
+
+
+def _doc_from(
     order_id: Any,
     user_email: str,
     event: str,
     payload: Optional[Dict[str, Any]] = None
-) -> str:
-    """
-    Writes an event document into Firestore Native. Returns the document id.
-
-    - retries temporary errors
-    - raises error if it still fails (so you KNOW it's broken)
-    """
-    db = get_client()
-
-    doc = {
+) -> Dict[str, Any]:
+    return {
         "order_id": str(order_id),
         "user_email": user_email or "",
         "event": event,
@@ -62,16 +69,64 @@ def log_order_event(
         "created_at_iso": _now_iso(),
     }
 
+
+def _with_retries(what: str, fn):
     last_err = None
     for attempt in range(1, MAX_RETRIES + 1):
         try:
-            ref = db.collection(COLLECTION_NAME).document()
-            ref.set(doc)
-            return ref.id
+            return fn()
 
         except (ServiceUnavailable, GoogleAPICallError, RetryError) as e:
             last_err = e
-            print(f"[Firestore] write failed (attempt {attempt}/{MAX_RETRIES}): {e}")
-            time.sleep(RETRY_SLEEP_SECONDS * attempt)
+            print(f"[Firestore] {what} failed (attempt {attempt}/{MAX_RETRIES}): {e}")
+            if attempt < MAX_RETRIES:
+                time.sleep(_backoff_seconds(attempt))
+
+    raise RuntimeError(f"Firestore {what} failed after {MAX_RETRIES} attempts: {last_err}")
+
+
+def log_order_event(
+    order_id: Any,
+    user_email: str,
+    event: str,
+    payload: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Writes an event document into Firestore Native. Returns the document id.
 
-    raise RuntimeError(f"Firestore write failed after {MAX_RETRIES} attempts: {last_err}")
+    - retries temporary errors
+    - raises error if it still fails (so you KNOW it's broken)
+    """
+    db = get_client()
+    doc = _doc_from(order_id, user_email, event, payload)
+
+    def _write() -> str:
+        ref = db.collection(COLLECTION_NAME).document()
+        ref.set(doc)
+        return ref.id
+
+    return _with_retries("write", _write)
+
+
+def log_order_events_bulk(events: Iterable[Dict[str, Any]]) -> List[str]:
+    """
+    Writes many events with WriteBatch commits of up to BATCH_SIZE.
+    Each event is a dict of log_order_event's arguments
+    (order_id, user_email, event, payload). Returns the document ids.
+
+    Same retry / raise behaviour as log_order_event, per batch.
+    """
+    db = get_client()
+    docs = [_doc_from(**e) for e in events]
+    col = db.collection(COLLECTION_NAME)
+
+    ids: List[str] = []
+    for start in range(0, len(docs), BATCH_SIZE):
+        batch = db.batch()
+        for doc in docs[start:start + BATCH_SIZE]:
+            ref = col.document()
+            batch.set(ref, doc)
+            ids.append(ref.id)
+        _with_retries("batch commit", batch.commit)
+
+    return ids
@@ -0,0 +1,109 @@
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from cachetools import TTLCache
+from sqlalchemy import func, select
+
+from sql_db import SessionLocal
+from models import MenuItem
+
+# -----------------------
+# SETTINGS
+# -----------------------
+MENU_CACHE_TTL_SECONDS = 30
+
+# Bumped on every menu write in this process; keys the ETag cache so local edits show at once.
+_menu_version = 0
+_menu_cache: TTLCache = TTLCache(maxsize=64, ttl=MENU_CACHE_TTL_SECONDS)
+_etag_cache: TTLCache = TTLCache(maxsize=4, ttl=MENU_CACHE_TTL_SECONDS)
+# cachetools caches aren't thread-safe; every get/set/clear goes through this.
+# The DB queries run outside it.
+_cache_lock = threading.Lock()
+
+
+def menu_version() -> int:
+    return _menu_version
+
+
+def invalidate_menu_cache() -> None:
+    """
+    Call after creating / updating / deleting menu items.
+    """
+    global _menu_version
+    with _cache_lock:
+        _menu_version += 1
+        _menu_cache.clear()
+        _etag_cache.clear()
+
+
+_MENU_COLUMNS = (
+    MenuItem.id,
+    MenuItem.name,
+    MenuItem.category,
+    MenuItem.description,
+    MenuItem.price,
+    MenuItem.image,
+)
+
+
+def get_menu_snapshot(
+    selected: str = "", etag: Optional[str] = None
+) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    Returns (categories, items) for the menu page, cached for a short TTL.
+    Items are plain dicts so they can be shared across requests.
+
+    Cached under menu_etag() (pass it in if already computed), so a body is
+    never served under a tag from a newer DB state, even after another
+    worker's edit.
+    """
+    if etag is None:
+        etag = menu_etag()
+
+    with _cache_lock:
+        key = (etag, selected)
+        cached = _menu_cache.get(key)
+    if cached is not None:
+        return cached
+
+    with SessionLocal() as s:
+        categories = [
+            c[0]
+            for c in s.query(MenuItem.category).distinct().order_by(MenuItem.category).all()
+            if c[0]
+        ]
+
+        # plain column rows: no ORM objects to build
+        q = select(*_MENU_COLUMNS)
+        if selected:
+            q = q.where(MenuItem.category == selected)
+
+        items = [r._asdict() for r in s.execute(q.order_by(MenuItem.category, MenuItem.name))]
+
+    snapshot = (categories, items)
+    with _cache_lock:
+        _menu_cache[key] = snapshot
+    return snapshot
+
+
+def menu_etag() -> str:
+    """
+    Short hash of (latest updated_at, item count). Changes on any create,
+    update or delete, including ones made by other workers.
+    """
+    with _cache_lock:
+        version = _menu_version
+        cached = _etag_cache.get(version)
+    if cached is not None:
+        return cached
+
+    with SessionLocal() as s:
+        max_updated, count = s.execute(
+            select(func.max(MenuItem.updated_at), func.count(MenuItem.id))
+        ).one()
+
+    etag = hashlib.blake2b(f"{max_updated}:{count}".encode(), digest_size=8).hexdigest()
+    with _cache_lock:
+        _etag_cache[version] = etag
+    return etag
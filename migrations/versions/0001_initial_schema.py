@@ -0,0 +1,63 @@
+"""initial schema (tables as previously created by create_all)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-14
+
+Existing databases already have these tables: run `alembic stamp 0001`
+once, then `alembic upgrade head`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("email", sa.String(255), nullable=False),
+        sa.Column("password_hash", sa.String(255), nullable=False),
+        sa.Column("role", sa.String(20), nullable=False),
+    )
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "menu_items",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("name", sa.String(120), nullable=False),
+        sa.Column("category", sa.String(60), nullable=False),
+        sa.Column("description", sa.String(500), nullable=True),
+        sa.Column("price", sa.Float, nullable=False),
+        sa.Column("image", sa.String(255), nullable=True),
+    )
+
+    op.create_table(
+        "orders",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime, server_default=sa.func.now(), nullable=False),
+        sa.Column("status", sa.String(30), nullable=False),
+    )
+
+    op.create_table(
+        "order_items",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("order_id", sa.Integer, sa.ForeignKey("orders.id"), nullable=False),
+        sa.Column("menu_item_id", sa.Integer, sa.ForeignKey("menu_items.id"), nullable=False),
+        sa.Column("qty", sa.Integer, nullable=False),
+        sa.Column("unit_price", sa.Float, nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("order_items")
+    op.drop_table("orders")
+    op.drop_table("menu_items")
+    op.drop_index("ix_users_email", table_name="users")
+    op.drop_table("users")
@@ -0,0 +1,29 @@
+"""add indexes for order history, daily summary and menu filtering
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-14
+"""
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_orders_user_id", "orders", ["user_id"])
+    op.create_index("ix_orders_created_at", "orders", ["created_at"])
+    op.create_index("ix_order_items_menu_item_id", "order_items", ["menu_item_id"])
+    op.create_index("ix_order_items_order_menu", "order_items", ["order_id", "menu_item_id"])
+    op.create_index("ix_menu_items_category", "menu_items", ["category"])
+
+
+def downgrade():
+    op.drop_index("ix_menu_items_category", table_name="menu_items")
+    op.drop_index("ix_order_items_order_menu", table_name="order_items")
+    op.drop_index("ix_order_items_menu_item_id", table_name="order_items")
+    op.drop_index("ix_orders_created_at", table_name="orders")
+    op.drop_index("ix_orders_user_id", table_name="orders")
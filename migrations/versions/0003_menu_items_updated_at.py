@@ -0,0 +1,27 @@
+"""add menu_items.updated_at (used for the menu ETag)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-14
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # batch mode so SQLite (no ALTER ... DEFAULT CURRENT_TIMESTAMP) rebuilds the table
+    with op.batch_alter_table("menu_items") as batch:
+        batch.add_column(
+            sa.Column("updated_at", sa.DateTime, server_default=sa.func.now(), nullable=False)
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("menu_items") as batch:
+        batch.drop_column("updated_at")
@@ -1,5 +1,11 @@
+from datetime import datetime, timezone
+
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, Float, ForeignKey, DateTime, func
+from sqlalchemy import String, Integer, Float, ForeignKey, DateTime, Index, func
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
 
 class Base(DeclarativeBase):
@@ -20,20 +26,30 @@ class MenuItem(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(120), nullable=False)
-    category: Mapped[str] = mapped_column(String(60), nullable=False)
+    category: Mapped[str] = mapped_column(String(60), index=True, nullable=False)
     description: Mapped[str | None] = mapped_column(String(500), nullable=True)
     price: Mapped[float] = mapped_column(Float, nullable=False)
 
     # store filename like "fries.jpg" (in static/images/)
     image: Mapped[str | None] = mapped_column(String(255), nullable=True)
 
+    # bumped on every write; feeds the menu ETag. Set from Python (naive UTC, µs)
+    # because SQLite's now() only has one-second resolution.
+    updated_at: Mapped[DateTime] = mapped_column(
+        DateTime,
+        default=_utcnow,
+        onupdate=_utcnow,
+        server_default=func.now(),
+        nullable=False,
+    )
+
 
 class Order(Base):
     __tablename__ = "orders"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
-    created_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True, nullable=False)
+    created_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now(), index=True)
     status: Mapped[str] = mapped_column(String(30), default="PLACED", nullable=False)
 
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
@@ -41,10 +57,14 @@ class Order(Base):
 
 class OrderItem(Base):
     __tablename__ = "order_items"
+    __table_args__ = (
+        Index("ix_order_items_order_menu", "order_id", "menu_item_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # order_id lookups are covered by ix_order_items_order_menu (leftmost column)
     order_id: Mapped[int] = mapped_column(ForeignKey("orders.id"), nullable=False)
-    menu_item_id: Mapped[int] = mapped_column(ForeignKey("menu_items.id"), nullable=False)
+    menu_item_id: Mapped[int] = mapped_column(ForeignKey("menu_items.id"), index=True, nullable=False)
     qty: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
     unit_price: Mapped[float] = mapped_column(Float, nullable=False)
 
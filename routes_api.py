@@ -1,17 +1,45 @@
-from flask import Blueprint, jsonify, request
+import json
+
+from flask import Blueprint, Response, jsonify, request, current_app
+from sqlalchemy import select
+
 from sql_db import SessionLocal
 from models import MenuItem
+from menu_cache import invalidate_menu_cache, menu_etag
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to stdlib json
+    orjson = None
 
 api = Blueprint("api", __name__, url_prefix="/api")
 
+
+def _json_response(data, status=200):
+    body = orjson.dumps(data) if orjson is not None else json.dumps(data)
+    return current_app.response_class(body, status=status, mimetype="application/json")
+
+
 @api.get("/menu")
 def get_menu():
+    etag = menu_etag()
+    if etag in request.if_none_match:
+        resp = Response(status=304)
+        resp.set_etag(etag)
+        return resp
+
     with SessionLocal() as s:
-        items = s.query(MenuItem).all()
-    return jsonify([{
-        "id": i.id, "name": i.name, "description": i.description,
-        "category": i.category, "price": i.price
-    } for i in items])
+        rows = s.execute(
+            select(
+                MenuItem.id, MenuItem.name, MenuItem.description,
+                MenuItem.category, MenuItem.price
+            )
+        ).all()
+    resp = _json_response([r._asdict() for r in rows])
+    resp.set_etag(etag)
+    resp.cache_control.public = True
+    resp.cache_control.max_age = 30
+    return resp
 
 @api.post("/menu")
 def create_menu():
@@ -26,4 +54,5 @@ def create_menu():
         s.add(item)
         s.commit()
         s.refresh(item)
+    invalidate_menu_cache()
     return jsonify({"ok": True, "id": item.id}), 201
@@ -1,54 +1,142 @@
+import hashlib
 import os
 import re
+import secrets
+import shutil
+import string
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timezone, timedelta
+from typing import Dict, Optional, Tuple
 
 from flask import (
     Blueprint, render_template, request, redirect, url_for,
-    session, flash, current_app
+    session, flash, current_app, g, make_response
 )
 from werkzeug.utils import secure_filename
-from sqlalchemy import func
+from sqlalchemy import exists, func, insert, select, update
+
+import google.auth
+from google.cloud import secretmanager
 
 from sql_db import SessionLocal
 from models import User, MenuItem, Order, OrderItem
-from auth import hash_password, verify_password, login_required, admin_required
+from auth import hash_password, verify_password, needs_rehash, login_required, admin_required
 from firestore_db import log_order_event
-from google.cloud import secretmanager
+from menu_cache import get_menu_snapshot, invalidate_menu_cache, menu_etag
 
 
 web = Blueprint("web", __name__)
 
-import google.auth
-from google.cloud import secretmanager
+# -----------------------
+# Secret Manager
+# -----------------------
+SECRET_CACHE_TTL_SECONDS = 600
+
+_sm_client: Optional[secretmanager.SecretManagerServiceClient] = None
+_sm_project_id: Optional[str] = None
+_secret_cache: Dict[str, Tuple[float, str]] = {}
+
+
+def _get_sm_client() -> Tuple[secretmanager.SecretManagerServiceClient, Optional[str]]:
+    """
+    Creates and caches the Secret Manager client (and resolved project id).
+    """
+    global _sm_client, _sm_project_id
+    if _sm_client is not None:
+        return _sm_client, _sm_project_id
+
+    creds, project_id = google.auth.default()
+    _sm_project_id = project_id or os.environ.get("GOOGLE_CLOUD_PROJECT")
+    _sm_client = secretmanager.SecretManagerServiceClient(credentials=creds)
+    return _sm_client, _sm_project_id
+
 
 def get_secret(name: str) -> str | None:
     """
     Read a secret from Google Secret Manager.
     Falls back to environment variable for local development.
+    Values are cached per process for SECRET_CACHE_TTL_SECONDS.
     """
     # Local dev fallback
     env_val = os.environ.get(name)
     if env_val:
         return env_val
 
-    try:
-        creds, project_id = google.auth.default()
-        if not project_id:
-            project_id = os.environ.get("GOOGLE_CLOUD_PROJECT")
+    cached = _secret_cache.get(name)
+    if cached and time.time() - cached[0] < SECRET_CACHE_TTL_SECONDS:
+        return cached[1]
 
+    try:
+        client, project_id = _get_sm_client()
         if not project_id:
             return None
 
-        client = secretmanager.SecretManagerServiceClient(credentials=creds)
         secret_path = f"projects/{project_id}/secrets/{name}/versions/latest"
         resp = client.access_secret_version(request={"name": secret_path})
-        return resp.payload.data.decode("utf-8").strip()
+        value = resp.payload.data.decode("utf-8").strip()
+        _secret_cache[name] = (time.time(), value)
+        return value
 
     except Exception as e:
         print(f"Secret Manager read failed for {name}: {e}")
         return None
 
+# -----------------------
+# Shared HTTP session for Cloud Function calls
+# -----------------------
+# (connect, read) seconds
+HTTP_TIMEOUT = (2, 10)
+
+_HTTP = requests.Session()
+_HTTP.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504]),
+    ),
+)
+
+
+# -----------------------
+# Background side-effects (Firestore log, Cloud Functions)
+# -----------------------
+_BG = ThreadPoolExecutor(max_workers=8, thread_name_prefix="bg")
+
+
+def _log_order_event_bg(**kwargs) -> str:
+    """
+    log_order_event for the background pool; prints the written doc id.
+    """
+    doc_id = log_order_event(**kwargs)
+    print("✅ Firestore wrote document:", doc_id)
+    return doc_id
+
+
+def _submit_bg(label: str, fn, *args, **kwargs) -> Optional[Future]:
+    """
+    Runs fn in the background pool so the response doesn't wait on it.
+    Failures are printed, never raised into the request.
+    """
+    def _done(fut: Future):
+        err = fut.exception()
+        if err is not None:
+            print(f"{label} failed:", err)
+
+    try:
+        fut = _BG.submit(fn, *args, **kwargs)
+    except RuntimeError as e:
+        # executor shut down (worker exiting)
+        print(f"{label} not scheduled:", e)
+        return None
+    fut.add_done_callback(_done)
+    return fut
+
+
 # -----------------------
 # Cloud Function helper (Daily Summary)
 # -----------------------
@@ -61,14 +149,14 @@ def send_daily_summary(date_str, total_sales, order_count):
         return
 
     try:
-        requests.post(
+        _HTTP.post(
             url,
             json={
                 "date": date_str,
                 "total_sales": float(total_sales),
                 "order_count": int(order_count),
             },
-            timeout=10,
+            timeout=HTTP_TIMEOUT,
         )
     except Exception as e:
         print("Daily summary function failed:", e)
@@ -88,14 +176,14 @@ def tell_robot(order_id, email, total):
         return
 
     try:
-        resp = requests.post(
+        resp = _HTTP.post(
             robot_house,
             json={
                 "order_id": int(order_id),
                 "email": str(email or ""),
                 "total": float(total),
             },
-            timeout=10,
+            timeout=HTTP_TIMEOUT,
         )
         print("Receipt:", resp.status_code, resp.text)
     except Exception as e:
@@ -109,21 +197,28 @@ def tell_robot(order_id, email, total):
 @login_required
 @admin_required
 def admin_run_daily_summary():
-    today = datetime.now(timezone.utc).date().isoformat()
+    today_date = datetime.now(timezone.utc).date()
+    today = today_date.isoformat()
 
-    with SessionLocal() as s:
-        order_count = s.query(func.count(Order.id)).scalar() or 0
+    # orders.created_at is stored as naive UTC (server_default now())
+    today_start = datetime.combine(today_date, datetime.min.time())
+    tomorrow_start = today_start + timedelta(days=1)
 
-        total_sales = (
-            s.query(func.sum(OrderItem.qty * OrderItem.unit_price))
-            .join(Order, Order.id == OrderItem.order_id)
-            .scalar()
-        ) or 0.0
+    with SessionLocal() as s:
+        order_count, total_sales = s.execute(
+            select(
+                func.count(Order.id.distinct()),
+                func.coalesce(func.sum(OrderItem.qty * OrderItem.unit_price), 0.0),
+            )
+            .select_from(Order)
+            .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+            .where(Order.created_at >= today_start, Order.created_at < tomorrow_start)
+        ).one()
 
-    send_daily_summary(today, total_sales, order_count)
+    _submit_bg("Daily summary", send_daily_summary, today, total_sales, order_count)
 
     flash(
-        f"Daily summary sent for {today} "
+        f"Daily summary queued for {today} "
         f"(orders: {order_count}, sales: £{float(total_sales):.2f})"
     )
 
@@ -149,7 +244,7 @@ def register():
         role = request.form.get("role", "customer")
 
         with SessionLocal() as s:
-            if s.query(User).filter_by(email=email).first():
+            if s.scalar(select(exists().where(User.email == email))):
                 flash("Email already exists.")
                 return redirect(url_for("web.register"))
 
@@ -170,13 +265,22 @@ def login():
         pw = request.form["password"]
 
         with SessionLocal() as s:
-            u = s.query(User).filter_by(email=email).first()
+            u = s.execute(
+                select(User.id, User.password_hash, User.role).where(User.email == email)
+            ).first()
             if not u or not verify_password(pw, u.password_hash):
                 flash("Invalid login.")
                 return redirect(url_for("web.login"))
 
+            # upgrade old hashes (werkzeug / previous cost) now that we know the password
+            if needs_rehash(u.password_hash):
+                s.execute(
+                    update(User).where(User.id == u.id).values(password_hash=hash_password(pw))
+                )
+                s.commit()
+
             session["user_id"] = u.id
-            session["email"] = u.email
+            session["email"] = email
             session["role"] = u.role
 
         flash("Logged in.")
@@ -197,30 +301,133 @@ def logout():
 def menu():
     selected = request.args.get("category", "").strip()
 
-    with SessionLocal() as s:
-        categories = [
-            c[0]
-            for c in s.query(MenuItem.category).distinct().order_by(MenuItem.category).all()
-            if c[0]
-        ]
+    menu_tag = menu_etag()
 
-        q = s.query(MenuItem)
-        if selected:
-            q = q.filter(MenuItem.category == selected)
+    # pending flashes must be rendered (and consumed), so never answer 304 then
+    etag = None
+    if "_flashes" not in session:
+        # the layout shows who is logged in, so the page varies per user
+        key = f"{menu_tag}:{selected}:{session.get('email', '')}:{session.get('role', '')}"
+        etag = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+        if etag in request.if_none_match:
+            resp = make_response("", 304)
+            resp.set_etag(etag)
+            return resp
 
-        items = q.order_by(MenuItem.category, MenuItem.name).all()
+    # snapshot is keyed on the same tag, so the body always matches the ETag
+    categories, items = get_menu_snapshot(selected, menu_tag)
 
-    return render_template("menu.html", items=items, categories=categories, selected=selected)
+    resp = make_response(
+        render_template("menu.html", items=items, categories=categories, selected=selected)
+    )
+    if etag:
+        resp.set_etag(etag)
+        # per-user page and a redirect target (login, cart_add): always revalidate,
+        # so flashes and the logged-in header are never skipped; 304 keeps it cheap
+        resp.cache_control.private = True
+        resp.cache_control.no_cache = True
+    return resp
 
 
 # -----------------------
 # Cart
 # -----------------------
+def get_items_for_ids(item_ids: tuple) -> dict:
+    """
+    Returns {id: MenuItem} for the given ids, cached on flask.g for the
+    rest of the request.
+    """
+    cache = g.setdefault("menu_items_by_ids", {})
+    if item_ids in cache:
+        return cache[item_ids]
+
+    if not item_ids:
+        items_map = {}
+    else:
+        with SessionLocal() as s:
+            items = s.query(MenuItem).filter(MenuItem.id.in_(item_ids)).all()
+            items_map = {i.id: i for i in items}
+
+    cache[item_ids] = items_map
+    return items_map
+
+
+def cart_to_arrays(cart: dict) -> tuple:
+    """
+    Splits {item_id: qty} into parallel (ids, qtys) lists.
+    """
+    return list(cart.keys()), list(cart.values())
+
+
+def _int_keyed(d: dict) -> dict:
+    # server-side sessions keep int keys; cookie sessions (no REDIS_URL)
+    # round-trip them through JSON as strings
+    if d and isinstance(next(iter(d)), str):
+        return {int(k): v for k, v in d.items()}
+    return d
+
+
+def _get_cart() -> dict:
+    """
+    The session cart as {item_id: qty}.
+    """
+    return _int_keyed(session.get("cart", {}))
+
+
+def _get_cart_prices() -> dict:
+    return _int_keyed(session.get("cart_prices", {}))
+
+
+def _price_entry(mi) -> dict:
+    return {"id": mi.id, "name": mi.name, "price": float(mi.price), "image": mi.image}
+
+
+def _cart_prices(cart: dict) -> dict:
+    """
+    Returns the session's {id: {id, name, price, image}} snapshot for the cart.
+    Only hits the DB for ids not in the snapshot, or for all of them once
+    CART_PRICES_TTL_SECONDS has passed. Prices here are for display only;
+    payment_post re-reads them from the DB.
+    """
+    prices = _get_cart_prices()
+    ttl = current_app.config["CART_PRICES_TTL_SECONDS"]
+    stale = time.time() - session.get("cart_prices_at", 0) > ttl
+
+    wanted = list(cart.keys()) if stale else [k for k in cart.keys() if k not in prices]
+    if not wanted:
+        return prices
+
+    items_map = get_items_for_ids(tuple(sorted(wanted)))
+    for k in wanted:
+        mi = items_map.get(k)
+        if mi:
+            prices[k] = _price_entry(mi)
+        else:
+            prices.pop(k, None)  # item no longer on the menu
+
+    session["cart_prices"] = prices
+    if stale:
+        session["cart_prices_at"] = time.time()
+    return prices
+
+
 @web.post("/cart/add/<int:item_id>")
 @login_required
 def cart_add(item_id: int):
-    cart = session.get("cart", {})
-    cart[str(item_id)] = int(cart.get(str(item_id), 0)) + 1
+    prices = _get_cart_prices()
+
+    if item_id not in prices:
+        with SessionLocal() as s:
+            mi = s.get(MenuItem, item_id)
+        if not mi:
+            flash("Item not found.")
+            return redirect(url_for("web.menu"))
+        prices[item_id] = _price_entry(mi)
+        session["cart_prices"] = prices
+        session.setdefault("cart_prices_at", time.time())
+
+    cart = _get_cart()
+    cart[item_id] = cart.get(item_id, 0) + 1
     session["cart"] = cart
     flash("Added to cart.")
     return redirect(url_for("web.menu"))
@@ -229,34 +436,34 @@ def cart_add(item_id: int):
 @web.get("/cart")
 @login_required
 def cart_view():
-    cart = session.get("cart", {})
-    item_ids = [int(k) for k in cart.keys()] if cart else []
+    cart = _get_cart()
+    prices = _cart_prices(cart) if cart else {}
 
-    with SessionLocal() as s:
-        items = s.query(MenuItem).filter(MenuItem.id.in_(item_ids)).all() if item_ids else []
-        items_map = {i.id: i for i in items}
+    ids, qtys = cart_to_arrays(cart)
 
     lines = []
-    total = 0.0
-    for k, qty in cart.items():
-        mi = items_map.get(int(k))
+    for item_id, qty in zip(ids, qtys):
+        mi = prices.get(item_id)
         if mi:
-            qty = int(qty)
-            line_total = float(mi.price) * qty
-            total += line_total
-            lines.append({"item": mi, "qty": qty, "line_total": line_total})
+            lines.append({"item": mi, "qty": qty, "line_total": mi["price"] * qty})
+    total = sum(l["line_total"] for l in lines)
 
     return render_template("cart.html", lines=lines, total=total)
 
 
+def _drop_cart_price(item_id: int) -> None:
+    prices = _get_cart_prices()
+    if item_id in prices:
+        prices.pop(item_id)
+        session["cart_prices"] = prices
+
+
 @web.post("/cart/update/<int:item_id>")
 @login_required
 def cart_update(item_id: int):
     action = request.form.get("action", "")
-    cart = session.get("cart", {})
-
-    key = str(item_id)
-    qty = int(cart.get(key, 0))
+    cart = _get_cart()
+    qty = cart.get(item_id, 0)
 
     if action == "inc":
         qty += 1
@@ -264,9 +471,10 @@ def cart_update(item_id: int):
         qty -= 1
 
     if qty <= 0:
-        cart.pop(key, None)
+        cart.pop(item_id, None)
+        _drop_cart_price(item_id)
     else:
-        cart[key] = qty
+        cart[item_id] = qty
 
     session["cart"] = cart
     return redirect(url_for("web.cart_view"))
@@ -275,33 +483,52 @@ def cart_update(item_id: int):
 @web.post("/cart/remove/<int:item_id>")
 @login_required
 def cart_remove(item_id: int):
-    cart = session.get("cart", {})
-    cart.pop(str(item_id), None)
+    cart = _get_cart()
+    cart.pop(item_id, None)
     session["cart"] = cart
+    _drop_cart_price(item_id)
     return redirect(url_for("web.cart_view"))
 
 
 # -----------------------
 # UK postcode validation
 # -----------------------
-UK_POSTCODE_RE = re.compile(
-    r"^(GIR 0AA|(?:[A-Z]{1,2}\d{1,2}[A-Z]?)\s?\d[A-Z]{2})$",
-    re.IGNORECASE,
+try:
+    import re2 as _regex  # google-re2: linear-time automaton matching, no backtracking
+except ImportError:  # optional: falls back to stdlib re
+    _regex = re
+
+# input is uppercased by _normalize_postcode first, so no IGNORECASE needed
+UK_POSTCODE_RE = _regex.compile(
+    r"^(GIR 0AA|(?:[A-Z]{1,2}\d{1,2}[A-Z]?)\s?\d[A-Z]{2})$"
 )
 
 
+# ASCII-only uppercase; postcodes are ASCII so this skips str.upper()'s Unicode tables
+_UPPER_TABLE = str.maketrans(string.ascii_lowercase, string.ascii_uppercase)
+
+
+def _normalize_postcode(pc: str) -> str:
+    return (pc or "").strip().translate(_UPPER_TABLE)
+
+
 def _is_valid_postcode(pc: str) -> bool:
-    pc = (pc or "").strip().upper()
+    # pc must already be _normalize_postcode()d; both checkout handlers do that
+    # when reading the form, so it isn't stripped/uppercased twice
     return bool(UK_POSTCODE_RE.match(pc))
 
 
+# Card expiry MM/YY
+EXP_RE = _regex.compile(r"^(0[1-9]|1[0-2])/\d{2}$")
+
+
 # -----------------------
 # Checkout + Payment
 # -----------------------
 @web.get("/checkout")
 @login_required
 def checkout():
-    cart = session.get("cart", {})
+    cart = _get_cart()
     if not cart:
         flash("Your cart is empty.")
         return redirect(url_for("web.cart_view"))
@@ -318,7 +545,7 @@ def checkout_post():
     address1 = request.form.get("address1", "").strip()
     address2 = request.form.get("address2", "").strip()
     city = request.form.get("city", "").strip()
-    postcode = request.form.get("postcode", "").strip().upper()
+    postcode = _normalize_postcode(request.form.get("postcode", ""))
 
     errors = []
     if not full_name:
@@ -359,7 +586,7 @@ def checkout_post():
 @web.get("/payment")
 @login_required
 def payment():
-    cart = session.get("cart", {})
+    cart = _get_cart()
     if not cart:
         flash("Your cart is empty.")
         return redirect(url_for("web.cart_view"))
@@ -374,7 +601,7 @@ def payment():
 @web.post("/payment")
 @login_required
 def payment_post():
-    cart = session.get("cart", {})
+    cart = _get_cart()
     if not cart:
         flash("Your cart is empty.")
         return redirect(url_for("web.cart_view"))
@@ -389,7 +616,7 @@ def payment_post():
     card_number = request.form.get("card_number", "").replace(" ", "").strip()
     exp = request.form.get("exp", "").strip()
     cvc = request.form.get("cvc", "").strip()
-    billing_postcode = request.form.get("billing_postcode", "").strip().upper()
+    billing_postcode = _normalize_postcode(request.form.get("billing_postcode", ""))
     agree = request.form.get("agree")
 
     errors = []
@@ -397,7 +624,7 @@ def payment_post():
         errors.append("Name on card is required.")
     if not (card_number.isdigit() and 12 <= len(card_number) <= 19):
         errors.append("Card number looks invalid (digits only).")
-    if not re.match(r"^(0[1-9]|1[0-2])\/\d{2}$", exp):
+    if not EXP_RE.match(exp):
         errors.append("Expiry must be in MM/YY format.")
     if not (cvc.isdigit() and len(cvc) in (3, 4)):
         errors.append("CVC looks invalid (3 or 4 digits).")
@@ -411,56 +638,55 @@ def payment_post():
             flash(e)
         return redirect(url_for("web.payment"))
 
-    # ✅ Create order AFTER payment
-    item_ids = [int(k) for k in cart.keys()]
+    # ✅ Create order AFTER payment (authoritative prices from DB, not the session snapshot)
+    ids, qtys = cart_to_arrays(cart)
 
     with SessionLocal() as s:
-        items = s.query(MenuItem).filter(MenuItem.id.in_(item_ids)).all()
-        items_map = {i.id: i for i in items}
+        price_by_id = dict(
+            s.execute(select(MenuItem.id, MenuItem.price).where(MenuItem.id.in_(ids))).all()
+        )
+        if len(price_by_id) != len(ids):
+            # some items have left the menu since they were added
+            qtys = [q for i, q in zip(ids, qtys) if i in price_by_id]
+            ids = [i for i in ids if i in price_by_id]
+        prices = [float(price_by_id[i]) for i in ids]
 
         # compute total for receipt
-        total = 0.0
-        for k, qty in cart.items():
-            mi = items_map.get(int(k))
-            if mi:
-                total += float(mi.price) * int(qty)
+        total = sum(p * q for p, q in zip(prices, qtys))
 
         order = Order(user_id=session["user_id"])
         s.add(order)
         s.flush()
 
-        for k, qty in cart.items():
-            mi = items_map.get(int(k))
-            if mi:
-                s.add(
-                    OrderItem(
-                        order_id=order.id,
-                        menu_item_id=mi.id,
-                        qty=int(qty),
-                        unit_price=float(mi.price),
-                    )
-                )
+        if ids:
+            # single executemany INSERT instead of one ORM object per line
+            s.execute(insert(OrderItem), [
+                {"order_id": order.id, "menu_item_id": i, "qty": q, "unit_price": p}
+                for i, q, p in zip(ids, qtys, prices)
+            ])
 
         s.commit()
         order_id = order.id
 
+    user_email = session.get("email", "")
+
     # Firestore log (your existing logging project)
-    try:
-        doc_id = log_order_event(
-            order_id=order_id,
-            user_email=session.get("email", ""),
-            event="PAYMENT_AUTHORISED",
-            payload={"delivery": checkout_data},
-        )
-        print("✅ Firestore wrote document:", doc_id)
-    except Exception as e:
-        print("Firestore log failed:", e)
+    _submit_bg(
+        "Firestore log",
+        _log_order_event_bg,
+        order_id=order_id,
+        user_email=user_email,
+        event="PAYMENT_AUTHORISED",
+        payload={"delivery": checkout_data},
+    )
 
     # ✅ Call Cloud Function (receipt)
-    tell_robot(order_id, session.get("email", ""), total)
+    _submit_bg("Receipt", tell_robot, order_id, user_email, total)
 
     # Clear cart + finish
     session["cart"] = {}
+    session.pop("cart_prices", None)
+    session.pop("cart_prices_at", None)
     flash(f"Payment successful. Order #{order_id} placed!")
     return redirect(url_for("web.orders"))
 
@@ -492,6 +718,8 @@ def orders():
 # Image uploads (Admin)
 # -----------------------
 ALLOWED_IMAGE_EXTS = {"png", "jpg", "jpeg", "webp"}
+UPLOAD_MAX_ATTEMPTS = 6  # original name + 5 randomised retries
+UPLOAD_CHUNK_SIZE = 64 * 1024
 
 
 def save_image_upload(file_storage):
@@ -511,13 +739,25 @@ def save_image_upload(file_storage):
         base = "image"
         ext2 = ext
 
+    # O_EXCL makes "does it exist?" and "create it" one atomic syscall
     candidate = filename
-    n = 1
-    while os.path.exists(os.path.join(images_dir, candidate)):
-        candidate = f"{base}_{n}.{ext2}"
-        n += 1
+    for _ in range(UPLOAD_MAX_ATTEMPTS):
+        path = os.path.join(images_dir, candidate)
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            break
+        except FileExistsError:
+            candidate = f"{base}_{secrets.token_hex(4)}.{ext2}"
+    else:
+        raise ValueError("Could not save image, please try again.")
+
+    try:
+        with os.fdopen(fd, "wb") as out:
+            shutil.copyfileobj(file_storage.stream, out, UPLOAD_CHUNK_SIZE)
+    except Exception:
+        os.remove(path)
+        raise
 
-    file_storage.save(os.path.join(images_dir, candidate))
     return candidate
 
 
@@ -574,6 +814,7 @@ def admin_menu_create():
             )
         )
         s.commit()
+    invalidate_menu_cache()
 
     flash("Menu item created.")
     return redirect(url_for("web.admin_menu"))
@@ -615,6 +856,7 @@ def admin_menu_update(item_id: int):
             item.image = new_image_name
 
         s.commit()
+    invalidate_menu_cache()
 
     flash("Menu item updated.")
     return redirect(url_for("web.admin_menu"))
@@ -629,6 +871,7 @@ def admin_menu_delete(item_id: int):
         if item:
             s.delete(item)
             s.commit()
+    invalidate_menu_cache()
 
     flash("Menu item deleted.")
     return redirect(url_for("web.admin_menu"))
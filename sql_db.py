@@ -1,16 +1,38 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 from config import Config
-from models import Base
 
 # Use the DB URL from your config (SQLite locally, Cloud SQL in production)
 DB_URL = Config.SQLALCHEMY_DATABASE_URI
 
-engine = create_engine(DB_URL, echo=False, future=True)
+if Config.LOCAL_DB:
+    # SQLite connections may be handed between request threads
+    engine = create_engine(
+        DB_URL,
+        echo=False,
+        future=True,
+        connect_args={"check_same_thread": False},
+    )
 
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record):
+        # WAL lets readers and the writer run concurrently; NORMAL is safe with WAL
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.close()
+else:
+    engine = create_engine(
+        DB_URL,
+        echo=False,
+        future=True,
+        pool_size=Config.DB_POOL_SIZE,
+        max_overflow=Config.DB_MAX_OVERFLOW,
+        pool_pre_ping=True,  # drop connections Cloud SQL closed while idle
+        pool_recycle=Config.DB_POOL_RECYCLE,
+        pool_timeout=Config.DB_POOL_TIMEOUT,
+    )
 
-# Create tables if they don't exist
-Base.metadata.create_all(engine)
+SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)